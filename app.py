@@ -3,10 +3,15 @@ AI Chat Assistant - Streamlit Application
 A modern chat interface that integrates with Azure AI Foundry for intelligent conversations.
 """
 import streamlit as st
-import time
-from typing import List, Dict
-from azure_ai_client import AzureAIClient
-from config import Config
+import asyncio
+import itertools
+import re
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
+from azure_ai_client import AzureAIClient, ServerBusyError, describe_error
+from config import CFG
+from demo_client import DemoAzureAIClient
 import logging
 
 # Configure page settings
@@ -21,10 +26,8 @@ st.set_page_config(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def apply_custom_css():
-    """Apply custom CSS for modern chat interface styling."""
-    st.markdown("""
-    <style>
+# Custom CSS for modern chat interface styling
+_CUSTOM_CSS_SOURCE = """
     /* Main container styling */
     .main .block-container {
         padding-top: 2rem;
@@ -32,56 +35,6 @@ def apply_custom_css():
         max-width: 800px;
     }
     
-    /* Chat message containers */
-    .chat-message {
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        display: flex;
-        align-items: flex-start;
-        animation: fadeIn 0.3s ease-in;
-    }
-    
-    .user-message {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        margin-left: 2rem;
-        flex-direction: row-reverse;
-    }
-    
-    .assistant-message {
-        background: #f8f9fa;
-        color: #333;
-        margin-right: 2rem;
-        border-left: 4px solid #007acc;
-    }
-    
-    .message-avatar {
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 1.2rem;
-        margin: 0 0.5rem;
-        flex-shrink: 0;
-    }
-    
-    .user-avatar {
-        background: rgba(255, 255, 255, 0.2);
-    }
-    
-    .assistant-avatar {
-        background: #007acc;
-        color: white;
-    }
-    
-    .message-content {
-        flex: 1;
-        line-height: 1.5;
-    }
-    
     /* Input area styling */
     .stTextInput > div > div > input {
         border-radius: 20px;
@@ -121,35 +74,6 @@ def apply_custom_css():
         margin-bottom: 2rem;
     }
     
-    /* Animations */
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .typing-indicator {
-        display: flex;
-        align-items: center;
-        gap: 4px;
-        padding: 1rem;
-    }
-    
-    .typing-dot {
-        width: 8px;
-        height: 8px;
-        border-radius: 50%;
-        background-color: #007acc;
-        animation: typing 1.4s infinite ease-in-out;
-    }
-    
-    .typing-dot:nth-child(2) { animation-delay: 0.2s; }
-    .typing-dot:nth-child(3) { animation-delay: 0.4s; }
-    
-    @keyframes typing {
-        0%, 60%, 100% { transform: translateY(0); }
-        30% { transform: translateY(-10px); }
-    }
-    
     /* Error message styling */
     .error-message {
         background: #ffebee;
@@ -169,57 +93,88 @@ def apply_custom_css():
         padding: 1rem;
         margin: 1rem 0;
     }
-    </style>
-    """, unsafe_allow_html=True)
+"""
+
+def _minify_css(css: str) -> str:
+    """Strip comments and collapse whitespace in a CSS string."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,])\s*", r"\1", css).strip()
+
+# Minified once at import instead of re-sent verbatim on every rerun
+_CUSTOM_CSS = "<style>" + _minify_css(_CUSTOM_CSS_SOURCE) + "</style>"
+
+# Avatars shown next to chat messages
+AVATARS = {"user": "👤", "assistant": "🤖"}
+
+@st.cache_resource
+def apply_custom_css():
+    """Apply custom CSS for modern chat interface styling (cached, replayed on reruns)."""
+    st.markdown(_CUSTOM_CSS, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start a single background event loop shared by all sessions.
+    
+    The async AI clients bind their HTTP connection pools to the loop they first
+    run on, so every coroutine must be scheduled on this same loop rather than on
+    a fresh one per rerun.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="ai-client-loop", daemon=True).start()
+    return loop
+
+def iterate_async(agen: AsyncIterator[str]) -> Iterator[str]:
+    """Consume an async generator from the Streamlit script thread."""
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        # Release the underlying HTTP stream if the consumer stops early
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+@st.cache_resource
+def get_ai_client() -> Tuple[Any, bool, Optional[str]]:
+    """
+    Create the AI client once per process and share it across sessions.
+    
+    Returns:
+        Tuple of (client, demo_mode, initialization error message)
+    """
+    try:
+        client = AzureAIClient()
+        logger.info("Azure AI client initialized successfully")
+        return client, False, None
+    except Exception as e:
+        # Fall back to demo mode if real client fails
+        logger.warning("Using demo mode due to: %s", e)
+        return DemoAzureAIClient(), True, str(e)
 
 def initialize_session_state():
     """Initialize Streamlit session state variables."""
     if "messages" not in st.session_state:
         st.session_state.messages = []
     
-    if "azure_client" not in st.session_state:
-        try:
-            from azure_ai_client import AzureAIClient
-            st.session_state.azure_client = AzureAIClient()
-            st.session_state.demo_mode = False
-            logger.info("Azure AI client initialized successfully")
-        except Exception as e:
-            # Fall back to demo mode if real client fails
-            from demo_client import DemoAzureAIClient
-            st.session_state.azure_client = DemoAzureAIClient()
-            st.session_state.demo_mode = True
-            st.session_state.client_error = str(e)
-            logger.warning(f"Using demo mode due to: {e}")
-
-def display_message(role: str, content: str, avatar: str = None):
-    """Display a chat message with proper styling."""
-    message_class = "user-message" if role == "user" else "assistant-message"
-    avatar_class = "user-avatar" if role == "user" else "assistant-avatar"
-    avatar_icon = "👤" if role == "user" else "🤖"
+    # Most recent messages sent to the model as context; older entries are
+    # evicted on append so the send path never has to slice the full history
+    if "history" not in st.session_state:
+        st.session_state.history = deque(maxlen=CFG.CONVERSATION_HISTORY_LIMIT)
     
-    st.markdown(f"""
-    <div class="chat-message {message_class}">
-        <div class="message-avatar {avatar_class}">
-            {avatar_icon}
-        </div>
-        <div class="message-content">
-            {content}
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-def display_typing_indicator():
-    """Display typing indicator animation."""
-    st.markdown("""
-    <div class="chat-message assistant-message">
-        <div class="message-avatar assistant-avatar">🤖</div>
-        <div class="typing-indicator">
-            <div class="typing-dot"></div>
-            <div class="typing-dot"></div>
-            <div class="typing-dot"></div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    # Running character count so the sidebar never rescans the history
+    if "total_chars" not in st.session_state:
+        st.session_state.total_chars = 0
+    
+    if "azure_client" not in st.session_state:
+        client, demo_mode, client_error = get_ai_client()
+        st.session_state.azure_client = client
+        st.session_state.demo_mode = demo_mode
+        if client_error:
+            st.session_state.client_error = client_error
 
 def display_error_message(message: str):
     """Display error message with proper styling."""
@@ -237,60 +192,101 @@ def display_success_message(message: str):
     </div>
     """, unsafe_allow_html=True)
 
-def get_conversation_history() -> List[Dict]:
-    """Get formatted conversation history for API calls."""
-    history = []
-    for msg in st.session_state.messages:
-        history.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-    return history
-
-def send_message_to_ai(user_message: str) -> str:
-    """Send message to Azure AI and return response."""
+def send_message_to_ai(user_message: str) -> Iterator[str]:
+    """Send message to Azure AI and stream the response as it arrives."""
+    conversation_history = []
+    streamed = False
     try:
         if not st.session_state.azure_client:
             raise Exception("Azure AI client is not initialized. Please check your configuration.")
         
-        # Get conversation history
-        conversation_history = get_conversation_history()
+        # The history deque is already capped and in the API's {"role", "content"}
+        # shape; one shallow copy keeps the request isolated from later reruns
+        conversation_history = list(st.session_state.history)
         
-        # Send message to Azure AI (works for both real and demo client)
-        response = st.session_state.azure_client.send_message(
+        # Stream the response from Azure AI (works for both real and demo client)
+        for chunk in iterate_async(st.session_state.azure_client.send_message_stream(
             message=user_message,
             conversation_history=conversation_history
-        )
-        
-        if response.get("success", True):
-            return response.get("content", "I apologize, but I couldn't generate a response.")
-        else:
-            error_msg = response.get("error", "Unknown error occurred")
-            raise Exception(f"AI service error: {error_msg}")
-            
+        )):
+            streamed = True
+            yield chunk
+    
+    except ServerBusyError as e:
+        # Transient overload: tell the user instead of dropping to demo mode
+        logger.warning("AI service busy: %s", e)
+        yield str(e)
+    
     except Exception as e:
-        logger.error(f"Error sending message to AI: {e}")
+        logger.error("Error sending message to AI: %s", e)
+        
+        # The live client already answered in part, so it works; note the
+        # interruption rather than appending a demo reply to a real answer
+        if streamed:
+            yield f"\n\n⚠️ The response was interrupted: {describe_error(e)}"
+            return
+        
         # If we're not in demo mode and encounter an error, fall back to demo mode
         if not hasattr(st.session_state, 'demo_mode') or not st.session_state.demo_mode:
             try:
-                from demo_client import DemoAzureAIClient
                 st.session_state.azure_client = DemoAzureAIClient()
                 st.session_state.demo_mode = True
                 # Retry with demo client
-                response = st.session_state.azure_client.send_message(
+                yield from iterate_async(st.session_state.azure_client.send_message_stream(
                     message=user_message,
                     conversation_history=conversation_history
-                )
-                return response.get("content", "Demo mode activated!")
+                ))
+                return
             except:
                 pass
         
-        return f"I apologize, but I encountered an error: {str(e)}"
+        yield f"I apologize, but I encountered an error: {describe_error(e)}"
 
 def clear_conversation():
     """Clear the conversation history."""
     st.session_state.messages = []
-    st.rerun()
+    st.session_state.history.clear()
+    st.session_state.total_chars = 0
+    
+    # Cached search results are shared by every session (the client is
+    # process-wide), so they are left to expire via RAG_CACHE_TTL
+
+def render_demo_banner(placeholder) -> None:
+    """Show the demo-mode banner in its placeholder, or clear it when live."""
+    if st.session_state.get('demo_mode'):
+        placeholder.markdown(
+            "<div style='background: #ff9800; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;'>🎭 DEMO MODE - Deploy a model in Azure AI Foundry for real AI responses</div>",
+            unsafe_allow_html=True
+        )
+    else:
+        placeholder.empty()
+
+def render_session_status(placeholder) -> None:
+    """Fill the sidebar's RAG status and session info for the current turn."""
+    with placeholder.container():
+        # Show RAG status; read from the service each time, since a search
+        # client that fails to build on the first query turns RAG off
+        rag_service = getattr(st.session_state.azure_client, 'rag_service', None)
+        if rag_service is not None and rag_service.available:
+            st.markdown("**RAG:** 🟢 Enabled")
+            st.markdown(f"**Search Index:** {CFG.AZURE_SEARCH_INDEX}")
+        else:
+            st.markdown("**RAG:** 🔴 Disabled")
+        
+        st.markdown("---")
+        st.markdown("### 📊 Session Info")
+        
+        # Show current mode
+        if st.session_state.get('demo_mode'):
+            st.markdown("**Mode:** 🎭 Demo")
+            st.info("Deploy a model in Azure AI Foundry to enable real AI responses!")
+        else:
+            st.markdown("**Mode:** 🤖 Live AI")
+        
+        st.markdown(f"**Messages:** {len(st.session_state.messages)}")
+        
+        if st.session_state.messages:
+            st.markdown(f"**Total Characters:** {st.session_state.total_chars:,}")
 
 def main():
     """Main application function."""
@@ -300,19 +296,19 @@ def main():
     # Initialize session state
     initialize_session_state()
     
-    # App header with demo mode indicator
-    demo_indicator = ""
-    if hasattr(st.session_state, 'demo_mode') and st.session_state.demo_mode:
-        demo_indicator = "<div style='background: #ff9800; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;'>🎭 DEMO MODE - Deploy a model in Azure AI Foundry for real AI responses</div>"
-    
+    # App header
     st.markdown(f"""
     <div class="chat-header">
-        <h1>🤖 {Config.APP_TITLE}</h1>
+        <h1>🤖 {CFG.APP_TITLE}</h1>
         <p>Powered by Azure AI Foundry</p>
     </div>
-    {demo_indicator}
     """, unsafe_allow_html=True)
     
+    # The demo banner and the sidebar status live in placeholders so they can be
+    # redrawn after this turn's message and any fallback to demo mode
+    demo_banner = st.empty()
+    render_demo_banner(demo_banner)
+    
     # Check for client initialization errors
     if hasattr(st.session_state, 'client_error'):
         display_error_message(f"Failed to initialize Azure AI client: {st.session_state.client_error}")
@@ -334,76 +330,60 @@ def main():
         
         st.markdown("---")
         st.markdown("### ⚙️ Settings")
-        st.markdown(f"**Model Temperature:** {Config.TEMPERATURE}")
-        st.markdown(f"**Max Tokens:** {Config.MAX_TOKENS}")
-        st.markdown(f"**History Limit:** {Config.CONVERSATION_HISTORY_LIMIT}")
-        
-        # Show RAG status
-        if Config.ENABLE_RAG and hasattr(st.session_state, 'azure_client') and hasattr(st.session_state.azure_client, 'rag_service'):
-            if st.session_state.azure_client.rag_service.is_available():
-                st.markdown("**RAG:** 🟢 Enabled")
-                st.markdown(f"**Search Index:** {Config.AZURE_SEARCH_INDEX}")
-            else:
-                st.markdown("**RAG:** 🔴 Disabled")
-        else:
-            st.markdown("**RAG:** 🔴 Disabled")
+        st.markdown(f"**Model Temperature:** {CFG.TEMPERATURE}")
+        st.markdown(f"**Max Tokens:** {CFG.MAX_TOKENS}")
+        st.markdown(f"**History Limit:** {CFG.CONVERSATION_HISTORY_LIMIT}")
         
-        st.markdown("---")
-        st.markdown("### 📊 Session Info")
-        
-        # Show current mode
-        if hasattr(st.session_state, 'demo_mode') and st.session_state.demo_mode:
-            st.markdown("**Mode:** 🎭 Demo")
-            st.info("Deploy a model in Azure AI Foundry to enable real AI responses!")
-        else:
-            st.markdown("**Mode:** 🤖 Live AI")
-        
-        st.markdown(f"**Messages:** {len(st.session_state.messages)}")
-        
-        if st.session_state.messages:
-            total_chars = sum(len(msg["content"]) for msg in st.session_state.messages)
-            st.markdown(f"**Total Characters:** {total_chars:,}")
+        session_status = st.empty()
+        render_session_status(session_status)
     
     # Chat interface
     st.markdown("### 💬 Conversation")
     
     # Display conversation history
-    if st.session_state.messages:
-        for message in st.session_state.messages:
-            display_message(message["role"], message["content"])
-    else:
-        st.markdown("""
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"], avatar=AVATARS.get(message["role"])):
+            st.markdown(message["content"])
+    
+    welcome = st.empty()
+    if not st.session_state.messages:
+        welcome.markdown("""
         <div style="text-align: center; padding: 2rem; color: #666;">
             👋 Welcome! Start a conversation by typing a message below.
         </div>
         """, unsafe_allow_html=True)
     
-    # Chat input
-    st.markdown("---")
-    
     # Use st.chat_input for better chat experience
     user_input = st.chat_input("Type your message here...")
     
     # Handle message sending
     if user_input:
-        # Add user message to conversation
-        st.session_state.messages.append({
-            "role": "user",
-            "content": user_input.strip()
-        })
+        welcome.empty()
+        
+        # Add user message to conversation and render it in place
+        user_message = {"role": "user", "content": user_input.strip()}
+        st.session_state.messages.append(user_message)
+        st.session_state.history.append(user_message)
+        st.session_state.total_chars += len(user_input.strip())
+        with st.chat_message("user", avatar=AVATARS["user"]):
+            st.markdown(user_input.strip())
         
-        # Get AI response
-        with st.spinner("Thinking..."):
-            ai_response = send_message_to_ai(user_input.strip())
+        # Stream AI response into the assistant bubble as tokens arrive, showing a
+        # spinner only while waiting for the first token (retrieval + time to first token)
+        with st.chat_message("assistant", avatar=AVATARS["assistant"]):
+            response_stream = send_message_to_ai(user_input.strip())
+            with st.spinner("Thinking..."):
+                first_chunk = next(response_stream, "")
+            ai_response = st.write_stream(itertools.chain((first_chunk,), response_stream))
         
         # Add AI response to conversation
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": ai_response
-        })
+        assistant_message = {"role": "assistant", "content": ai_response}
+        st.session_state.messages.append(assistant_message)
+        st.session_state.history.append(assistant_message)
+        st.session_state.total_chars += len(ai_response)
         
-        # Rerun to update the interface
-        st.rerun()
+        render_demo_banner(demo_banner)
+        render_session_status(session_status)
     
     # Footer
     st.markdown("---")
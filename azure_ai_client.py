@@ -2,16 +2,60 @@
 Azure OpenAI client wrapper with RAG (Retrieval-Augmented Generation) support.
 Integrates Azure AI Search for enhanced responses grounded in your data.
 """
+import asyncio
 import logging
-from typing import Dict, List, Optional
-from openai import AzureOpenAI
-from config import Config
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from openai import APITimeoutError, AsyncAzureOpenAI, AuthenticationError, NotFoundError, RateLimitError
+from config import CFG
 from rag_service import RAGService
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entry point
 logger = logging.getLogger(__name__)
 
+# System prompt sent ahead of every conversation (shared, never mutated)
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful AI assistant. Provide clear, accurate, and helpful responses."
+}
+
+# Bounds in-flight completions across all sessions sharing this process
+_COMPLETION_SEMAPHORE = asyncio.Semaphore(CFG.MAX_CONCURRENT_CALLS)
+
+class ServerBusyError(Exception):
+    """Raised when no completion slot frees up within the configured wait."""
+
+@asynccontextmanager
+async def _completion_slot() -> AsyncIterator[None]:
+    """Hold one of the process-wide completion slots for the duration of a request."""
+    try:
+        await asyncio.wait_for(_COMPLETION_SEMAPHORE.acquire(), timeout=CFG.CONCURRENCY_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ServerBusyError("The server is busy. Please try again in a moment.") from None
+    
+    try:
+        yield
+    finally:
+        _COMPLETION_SEMAPHORE.release()
+
+def describe_error(error: Exception) -> str:
+    """
+    Map an exception to a user-friendly error message.
+    
+    Dispatches on the OpenAI SDK's typed exceptions rather than inspecting the
+    error text, which changes between SDK versions.
+    """
+    if isinstance(error, AuthenticationError):
+        return "Authentication failed. Please check your API key."
+    if isinstance(error, NotFoundError):
+        return f"Model deployment '{CFG.AZURE_OPENAI_DEPLOYMENT}' not found. Please verify your deployment name."
+    if isinstance(error, RateLimitError):
+        return "Rate limit exceeded. Please wait and try again."
+    if isinstance(error, APITimeoutError):
+        return "Request timed out. Please try again."
+    return str(error)
+
 class AzureAIClient:
     """
     Azure OpenAI client with RAG (Retrieval-Augmented Generation) support.
@@ -20,30 +64,36 @@ class AzureAIClient:
     
     def __init__(self):
         """Initialize the Azure OpenAI client and RAG service."""
-        self.config = Config()
+        self.config = CFG
         self.config.validate()
         
         try:
-            # Initialize Azure OpenAI client
-            self.client = AzureOpenAI(
+            # Initialize async Azure OpenAI client so requests never block the UI thread.
+            # HTTP/2 with a keep-alive pool lets concurrent requests share one TLS session.
+            self.client = AsyncAzureOpenAI(
                 azure_endpoint=self.config.AZURE_OPENAI_ENDPOINT,
                 api_key=self.config.AZURE_OPENAI_API_KEY,
-                api_version="2024-02-01"
+                api_version=self.config.AZURE_OPENAI_API_VERSION,
+                http_client=httpx.AsyncClient(
+                    http2=True,
+                    timeout=self.config.REQUEST_TIMEOUT,
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40)
+                )
             )
             
-            # Initialize RAG service
-            self.rag_service = RAGService()
+            # Shared RAG service; its search clients connect on first use
+            self.rag_service = RAGService.get()
             
-            if self.rag_service.is_available():
-                logger.info("Azure OpenAI client with RAG initialized successfully")
+            if self.rag_service.configured:
+                logger.info("Azure OpenAI client initialized (RAG configured; search connects on first query)")
             else:
                 logger.info("Azure OpenAI client initialized (RAG disabled)")
             
         except Exception as e:
-            logger.error(f"Failed to initialize Azure AI client: {e}")
+            logger.error("Failed to initialize Azure AI client: %s", e)
             raise
     
-    def send_message(self, message: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
+    async def send_message(self, message: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
         """
         Send a message to Azure OpenAI and get response.
         
@@ -59,21 +109,22 @@ class AzureAIClient:
         
         try:
             # Enhance message with RAG if available
-            enhanced_message = self._enhance_with_rag(message) if self.rag_service.is_available() else message
+            enhanced_message = await self._enhance_with_rag(message) if self.rag_service.available else message
             
             # Prepare messages for the API
             messages = self._prepare_messages(enhanced_message, conversation_history or [])
             
-            logger.info(f"Sending request to Azure OpenAI: {len(enhanced_message)} characters")
+            logger.info("Sending request to Azure OpenAI: %d characters", len(enhanced_message))
             
             # Make the API call using the OpenAI SDK
-            response = self.client.chat.completions.create(
-                model=self.config.AZURE_OPENAI_DEPLOYMENT,  # This is the deployment name
-                messages=messages,
-                max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE,
-                stream=False
-            )
+            async with _completion_slot():
+                response = await self.client.chat.completions.create(
+                    model=self.config.AZURE_OPENAI_DEPLOYMENT,  # This is the deployment name
+                    messages=messages,
+                    max_tokens=self.config.MAX_TOKENS,
+                    temperature=self.config.TEMPERATURE,
+                    stream=False
+                )
             
             # Extract the response content
             content = response.choices[0].message.content
@@ -92,25 +143,80 @@ class AzureAIClient:
             }
             
         except Exception as e:
-            logger.error(f"Error communicating with Azure OpenAI: {e}")
-            
-            # Provide user-friendly error messages
-            error_msg = str(e)
-            if "401" in error_msg or "unauthorized" in error_msg.lower():
-                error_msg = "Authentication failed. Please check your API key."
-            elif "404" in error_msg or "not found" in error_msg.lower():
-                error_msg = f"Model deployment '{self.config.AZURE_OPENAI_DEPLOYMENT}' not found. Please verify your deployment name."
-            elif "429" in error_msg or "rate limit" in error_msg.lower():
-                error_msg = "Rate limit exceeded. Please wait and try again."
-            elif "timeout" in error_msg.lower():
-                error_msg = "Request timed out. Please try again."
+            return self._error_response(e, describe_error(e))
+
+    def _error_response(self, error: Exception, error_msg: str) -> Dict:
+        """
+        Build the failed-response dict returned by send_message.
+        
+        Args:
+            error: Exception raised while talking to Azure OpenAI
+            error_msg: User-facing description of the error
             
-            return {
-                "content": f"I apologize, but I encountered an error: {error_msg}",
-                "success": False,
-                "error": error_msg
-            }
-    
+        Returns:
+            Dict describing the failure
+        """
+        logger.error("Error communicating with Azure OpenAI: %s", error)
+        
+        return {
+            "content": f"I apologize, but I encountered an error: {error_msg}",
+            "success": False,
+            "error": error_msg
+        }
+
+    async def send_message_stream(self, message: str, conversation_history: Optional[List[Dict]] = None) -> AsyncIterator[str]:
+        """
+        Send a message to Azure OpenAI and stream the response as it is generated.
+
+        Args:
+            message: User input message
+            conversation_history: Previous conversation context
+
+        Yields:
+            Incremental chunks of the AI response content
+
+        Raises:
+            Exception: If the request to Azure OpenAI fails
+        """
+        if not message or not message.strip():
+            raise ValueError("Message cannot be empty")
+
+        # Enhance message with RAG if available
+        enhanced_message = await self._enhance_with_rag(message) if self.rag_service.available else message
+
+        # Prepare messages for the API
+        messages = self._prepare_messages(enhanced_message, conversation_history or [])
+
+        logger.info("Sending streaming request to Azure OpenAI: %d characters", len(enhanced_message))
+
+        # The slot is held until the stream is fully consumed
+        async with _completion_slot():
+            response = await self.client.chat.completions.create(
+                model=self.config.AZURE_OPENAI_DEPLOYMENT,  # This is the deployment name
+                messages=messages,
+                max_tokens=self.config.MAX_TOKENS,
+                temperature=self.config.TEMPERATURE,
+                stream=True
+            )
+
+            streamed = False
+            async for chunk in response:
+                # Azure may send chunks without choices (e.g. content filter results)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    streamed = True
+                    yield delta
+
+        if not streamed:
+            # Empty or fully filtered completion; match the non-streaming fallback
+            logger.warning("Azure OpenAI returned an empty streamed response")
+            yield "I apologize, but I couldn't generate a response."
+            return
+
+        logger.info("Successfully streamed response from Azure OpenAI")
+
     def _prepare_messages(self, message: str, conversation_history: List[Dict]) -> List[Dict]:
         """
         Prepare message format for Azure OpenAI API.
@@ -122,27 +228,21 @@ class AzureAIClient:
         Returns:
             List of formatted messages for the API
         """
-        messages = []
-        
-        # Add system message for context
-        messages.append({
-            "role": "system",
-            "content": "You are a helpful AI assistant. Provide clear, accurate, and helpful responses."
-        })
-        
-        # Add conversation history (limit to prevent token overflow)
-        recent_history = conversation_history[-self.config.CONVERSATION_HISTORY_LIMIT:]
-        messages.extend(recent_history)
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": message
-        })
+        # Limit history to prevent token overflow; callers that already keep a
+        # capped history (the app's deque) skip the intermediate slice copy
+        limit = self.config.CONVERSATION_HISTORY_LIMIT
+        if len(conversation_history) > limit:
+            conversation_history = conversation_history[-limit:]
         
-        return messages
+        # System prompt, recent history and the current user message, built in
+        # a single list allocation
+        return [
+            _SYSTEM_MESSAGE,
+            *conversation_history,
+            {"role": "user", "content": message}
+        ]
     
-    def _enhance_with_rag(self, message: str) -> str:
+    async def _enhance_with_rag(self, message: str) -> str:
         """
         Enhance user message with relevant context from Azure AI Search.
         
@@ -153,19 +253,20 @@ class AzureAIClient:
             Enhanced message with context or original message if RAG fails
         """
         try:
-            # Search for relevant documents
-            documents = self.rag_service.search_documents(message)
+            # Async search races the fallback strategies instead of trying them in turn
+            documents = await self.rag_service.retrieve_async(message)
             
             if documents:
                 # Create context-enriched prompt
                 enhanced_message = self.rag_service.create_context_prompt(documents, message)
-                logger.info(f"Enhanced message with {len(documents)} relevant documents")
-                logger.info(f"Enhanced Mesage: {enhanced_message}")
+                logger.info("Enhanced message with %d relevant documents", len(documents))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Enhanced message: %s", enhanced_message)
                 return enhanced_message
             else:
                 logger.info("No relevant documents found, using original message")
                 return message
                 
         except Exception as e:
-            logger.error(f"Error enhancing message with RAG: {e}")
-            return message
\ No newline at end of file
+            logger.error("Error enhancing message with RAG: %s", e)
+            return message
@@ -3,63 +3,102 @@ Configuration management for the AI Chat Assistant.
 Handles environment variables and application settings securely.
 """
 import os
+from dataclasses import dataclass, field
 from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class for managing application settings."""
+    """
+    Configuration class for managing application settings.
+    
+    Values are parsed from the environment once at import and frozen; use the
+    module-level ``CFG`` instance instead of creating new ones.
+    """
     
     # Azure OpenAI Configuration
     AZURE_OPENAI_ENDPOINT: str = os.getenv(
-        "AZURE_OPENAI_ENDPOINT", 
+        "AZURE_OPENAI_ENDPOINT",
         "https://az-ai-foundry-instance.cognitiveservices.azure.com/"
     )
-    AZURE_OPENAI_API_KEY: Optional[str] = os.getenv("AZURE_OPENAI_API_KEY")
+    AZURE_OPENAI_API_KEY: Optional[str] = field(default=os.getenv("AZURE_OPENAI_API_KEY"), repr=False)
     AZURE_OPENAI_DEPLOYMENT: str = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
     MODEL_NAME: str = os.getenv("MODEL_NAME", "gpt-4o-mini")
+    AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    AZURE_OPENAI_EMBEDDING_MODEL: str = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")  # Embedding deployment for vector search
+    AZURE_OPENAI_EMBEDDING_DIMENSIONS: int = int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "512"))  # 0 uses the model's native size
     
     # Azure AI Search Configuration (for RAG)
     AZURE_SEARCH_ENDPOINT: str = os.getenv("AZURE_SEARCH_ENDPOINT", "")
-    AZURE_SEARCH_KEY: Optional[str] = os.getenv("AZURE_SEARCH_KEY")
+    AZURE_SEARCH_KEY: Optional[str] = field(default=os.getenv("AZURE_SEARCH_KEY"), repr=False)
     AZURE_SEARCH_INDEX: str = os.getenv("AZURE_SEARCH_INDEX", "")
     
     # RAG Configuration
     ENABLE_RAG: bool = os.getenv("ENABLE_RAG", "true").lower() == "true"
     RAG_TOP_K: int = int(os.getenv("RAG_TOP_K", "5"))  # Number of search results to retrieve
     RAG_SEARCH_TYPE: str = os.getenv("RAG_SEARCH_TYPE", "hybrid")  # "hybrid", "vector", or "text"
+    RAG_VECTOR_FIELD: str = os.getenv("RAG_VECTOR_FIELD", "text_vector")  # Index vector field matching the embedding dimensions
+    RAG_VECTOR_EXHAUSTIVE: bool = os.getenv("RAG_VECTOR_EXHAUSTIVE", "false").lower() == "true"  # Exact KNN; faster on small indexes
+    RAG_MIN_QUERY_LEN: int = int(os.getenv("RAG_MIN_QUERY_LEN", "3"))  # Shorter queries skip retrieval
+    RAG_HYBRID_TIMEOUT: float = float(os.getenv("RAG_HYBRID_TIMEOUT", "1.0"))  # Seconds to wait for hybrid before using semantic results
+    RAG_SELECT_FIELDS: str = os.getenv("RAG_SELECT_FIELDS", "")  # Comma-separated index fields to retrieve; empty retrieves all
+    RAG_CACHE_SIZE: int = int(os.getenv("RAG_CACHE_SIZE", "1024"))  # Cached search results (distinct queries)
+    RAG_CACHE_TTL: int = int(os.getenv("RAG_CACHE_TTL", "300"))  # Seconds before cached results expire
+    RAG_SEMANTIC_CACHE_SIZE: int = int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "1024"))  # 0 disables the semantic cache
+    RAG_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.95"))  # Cosine similarity for a hit
+    EMB_CACHE_DIR: str = os.getenv("EMB_CACHE_DIR", ".cache/embeddings")  # Persistent embedding cache; empty disables it
     
     # Application Configuration
     APP_TITLE: str = os.getenv("APP_TITLE", "AI Chat Assistant")
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "1000"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.7"))
     CONVERSATION_HISTORY_LIMIT: int = int(os.getenv("CONVERSATION_HISTORY_LIMIT", "50"))
+    DEMO_DELAY: float = float(os.getenv("DEMO_DELAY", "1.5"))  # Simulated response time in demo mode (seconds)
     
     # Request Configuration
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
+    MAX_CONCURRENT_CALLS: int = int(os.getenv("MAX_CONCURRENT_CALLS", "8"))  # In-flight completions per process
+    CONCURRENCY_WAIT_TIMEOUT: float = float(os.getenv("CONCURRENCY_WAIT_TIMEOUT", "10"))  # Seconds to wait for a free slot
     
-    @classmethod
-    def validate(cls) -> bool:
-        """Validate required configuration settings."""
-        if not cls.AZURE_OPENAI_ENDPOINT:
-            raise ValueError("AZURE_OPENAI_ENDPOINT is required")
+    # Result of the one-time validation in __post_init__ (None when valid)
+    _validation_error: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Run the configuration checks once and remember the outcome."""
+        object.__setattr__(self, "_validation_error", self._check())
+    
+    def _check(self) -> Optional[str]:
+        """Return the first configuration problem found, or None if valid."""
+        if not self.AZURE_OPENAI_ENDPOINT:
+            return "AZURE_OPENAI_ENDPOINT is required"
         
-        if not cls.AZURE_OPENAI_API_KEY:
-            raise ValueError("AZURE_OPENAI_API_KEY is required")
+        if not self.AZURE_OPENAI_API_KEY:
+            return "AZURE_OPENAI_API_KEY is required"
         
-        if not cls.AZURE_OPENAI_DEPLOYMENT:
-            raise ValueError("AZURE_OPENAI_DEPLOYMENT is required")
+        if not self.AZURE_OPENAI_DEPLOYMENT:
+            return "AZURE_OPENAI_DEPLOYMENT is required"
         
         # Validate RAG configuration if enabled
-        if cls.ENABLE_RAG:
-            if not cls.AZURE_SEARCH_ENDPOINT:
-                raise ValueError("AZURE_SEARCH_ENDPOINT is required when RAG is enabled")
-            if not cls.AZURE_SEARCH_KEY:
-                raise ValueError("AZURE_SEARCH_KEY is required when RAG is enabled")
-            if not cls.AZURE_SEARCH_INDEX:
-                raise ValueError("AZURE_SEARCH_INDEX is required when RAG is enabled")
+        if self.ENABLE_RAG:
+            if not self.AZURE_SEARCH_ENDPOINT:
+                return "AZURE_SEARCH_ENDPOINT is required when RAG is enabled"
+            if not self.AZURE_SEARCH_KEY:
+                return "AZURE_SEARCH_KEY is required when RAG is enabled"
+            if not self.AZURE_SEARCH_INDEX:
+                return "AZURE_SEARCH_INDEX is required when RAG is enabled"
         
-        return True
\ No newline at end of file
+        return None
+    
+    def validate(self) -> bool:
+        """Validate required configuration settings."""
+        if self._validation_error:
+            raise ValueError(self._validation_error)
+        
+        return True
+
+# Shared, already-validated configuration instance
+CFG = Config()
@@ -1,20 +1,48 @@
 """
 Demo Azure AI Client - Simulates responses when no model is deployed
 """
-import time
+import asyncio
 import random
-from typing import Dict, List, Optional
-from config import Config
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from config import CFG
+
+# Framing added around every demo response
+_DEMO_PREFIX = "🎭 **DEMO MODE**: "
+_DEMO_SUFFIX = "\n\n💡 **Next Step**: Deploy a model in Azure AI Foundry to enable real AI responses!"
+
+# Keyword-specific demo responses, matched with a single regex scan
+_HELLO_RESPONSE = "Hello! I'm your demo AI assistant. Deploy a model in Azure AI Foundry to unlock real AI conversations!"
+_DEPLOY_RESPONSE = "To deploy a model: Go to ai.azure.com → Your Project → Deployments → Create New Deployment → Choose a model like GPT-4"
+_DEMO_KEYWORD_RESPONSES = {
+    "hello": _HELLO_RESPONSE,
+    "hi": _HELLO_RESPONSE,
+    "deploy": _DEPLOY_RESPONSE,
+    "model": _DEPLOY_RESPONSE,
+    "test": "Test successful! ✅ Your Streamlit chat interface is working perfectly. Just need that model deployment!",
+}
+_DEMO_KEYWORD_RE = re.compile(r"\b(hello|hi|deploy|model|test)\b", re.IGNORECASE)
+
+_DEMO_DETAILED_RESPONSE = "I can see you're writing detailed messages! Once you deploy a model, I'll be able to provide thoughtful, detailed responses to match."
+
+# Generic demo responses chosen at random
+_DEMO_RESPONSES = (
+    "Hello! I'm a demo AI assistant. Your Azure AI Foundry project needs a model deployment to work with real AI responses.",
+    "This is a simulated response! Once you deploy a model in Azure AI Foundry, I'll provide real AI-powered answers.",
+    "Great question! I'm currently in demo mode. Deploy a model like GPT-4 in your Azure AI Foundry project to unlock my full capabilities.",
+    "I understand you're testing the chat interface. Everything looks good! Just deploy a model in Azure AI Foundry to get started.",
+    "This chat interface is working perfectly! The only missing piece is deploying a model in your Azure AI Foundry project.",
+)
 
 class DemoAzureAIClient:
     """Demo client that simulates Azure AI responses for testing purposes."""
     
     def __init__(self):
         """Initialize demo client."""
-        self.config = Config()
+        self.config = CFG
         print("🎭 Demo mode activated - Simulating Azure AI responses")
     
-    def send_message(self, message: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
+    async def send_message(self, message: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
         """
         Simulate AI response for demo purposes.
         
@@ -25,33 +53,42 @@ class DemoAzureAIClient:
         Returns:
             Dict containing simulated AI response
         """
-        # Simulate processing time
-        time.sleep(random.uniform(1, 2))
+        # Simulate processing time (DEMO_DELAY=0 disables it)
+        if self.config.DEMO_DELAY > 0:
+            await asyncio.sleep(self.config.DEMO_DELAY)
         
-        # Demo responses based on message content
-        demo_responses = [
-            "Hello! I'm a demo AI assistant. Your Azure AI Foundry project needs a model deployment to work with real AI responses.",
-            "This is a simulated response! Once you deploy a model in Azure AI Foundry, I'll provide real AI-powered answers.",
-            "Great question! I'm currently in demo mode. Deploy a model like GPT-4 in your Azure AI Foundry project to unlock my full capabilities.",
-            "I understand you're testing the chat interface. Everything looks good! Just deploy a model in Azure AI Foundry to get started.",
-            "This chat interface is working perfectly! The only missing piece is deploying a model in your Azure AI Foundry project.",
-        ]
-        
-        # Choose response based on message content or randomly
-        if "hello" in message.lower() or "hi" in message.lower():
-            response = "Hello! I'm your demo AI assistant. Deploy a model in Azure AI Foundry to unlock real AI conversations!"
-        elif "deploy" in message.lower() or "model" in message.lower():
-            response = "To deploy a model: Go to ai.azure.com → Your Project → Deployments → Create New Deployment → Choose a model like GPT-4"
-        elif "test" in message.lower():
-            response = "Test successful! ✅ Your Streamlit chat interface is working perfectly. Just need that model deployment!"
-        elif len(message) > 50:
-            response = "I can see you're writing detailed messages! Once you deploy a model, I'll be able to provide thoughtful, detailed responses to match."
-        else:
-            response = random.choice(demo_responses)
+        response = self._choose_response(message)
         
         return {
-            "content": f"🎭 **DEMO MODE**: {response}\n\n💡 **Next Step**: Deploy a model in Azure AI Foundry to enable real AI responses!",
+            "content": _DEMO_PREFIX + response + _DEMO_SUFFIX,
             "model": "demo-model",
             "usage": {"total_tokens": len(message) + len(response)},
             "success": True
-        }
\ No newline at end of file
+        }
+    
+    async def send_message_stream(self, message: str, conversation_history: Optional[List[Dict]] = None) -> AsyncIterator[str]:
+        """
+        Simulate a streamed AI response for demo purposes.
+        
+        Args:
+            message: User input message
+            conversation_history: Previous conversation context
+            
+        Yields:
+            Simulated response chunks, word by word
+        """
+        content = (await self.send_message(message, conversation_history))["content"]
+        
+        for word in content.split(" "):
+            yield word + " "
+            await asyncio.sleep(0.02)
+    
+    def _choose_response(self, message: str) -> str:
+        """Pick a simulated response based on the message content."""
+        # Choose response based on message content or randomly
+        match = _DEMO_KEYWORD_RE.search(message)
+        if match:
+            return _DEMO_KEYWORD_RESPONSES[match.group(1).lower()]
+        if len(message) > 50:
+            return _DEMO_DETAILED_RESPONSE
+        return random.choice(_DEMO_RESPONSES)
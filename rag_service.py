@@ -2,82 +2,508 @@
 RAG (Retrieval-Augmented Generation) service using Azure AI Search and Azure OpenAI.
 Implements the classic RAG pattern for enhanced AI responses grounded in your data.
 """
+import asyncio
+import hashlib
+import itertools
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from dataclasses import dataclass, field, replace
+from functools import cached_property, lru_cache
+from typing import Callable, ClassVar, Dict, List, Optional, Any, Sequence, Tuple, Union
+import aiohttp
+import diskcache
+import httpx
+import numpy as np
+import requests
+from cachetools import LRUCache, TTLCache
+from requests.adapters import HTTPAdapter
 from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
-from config import Config
+from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+from azure.identity import ChainedTokenCredential, DefaultAzureCredential, ManagedIdentityCredential
+from azure.identity.aio import ChainedTokenCredential as AsyncChainedTokenCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+from azure.identity.aio import ManagedIdentityCredential as AsyncManagedIdentityCredential
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from config import CFG
+from semantic_cache import SemanticCache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entry point
 logger = logging.getLogger(__name__)
 
+# Storage precision for cached embeddings; ~3 significant digits is plenty for
+# cosine similarity and halves memory and bandwidth versus float32
+EMBEDDING_DTYPE = np.float16
+
+# Maximum number of inputs sent in one batched embeddings request
+EMBEDDING_BATCH_SIZE = 16
+
+# Characters of each document's content included in the prompt
+MAX_DOCUMENT_CHARS = 2000
+
+# Leading characters of a document fingerprinted to detect duplicate chunks
+DEDUP_PREFIX_CHARS = 512
+
+# Greetings and acknowledgements that never benefit from document retrieval
+_CHITCHAT = frozenset({
+    "hi", "hello", "hey", "thanks", "thank", "you", "thx", "ok", "okay",
+    "yes", "no", "bye", "goodbye", "cool", "great", "sure", "please"
+})
+
+# Fixed opening of every context-enriched prompt built by create_context_prompt.
+# It must stay byte-identical between requests (no timestamps, ids or other
+# per-request values): providers with prompt caching (Azure OpenAI, vLLM
+# prefix caching) skip prefill for a repeated prefix, so everything that
+# varies - documents and the question - is appended after it.
+_PROMPT_PREFIX = (
+    "You are a helpful AI assistant. Use the following context information to answer the user's question. "
+    "If the context doesn't contain relevant information, say so and provide a general response.\n"
+    "\n"
+    "Instructions:\n"
+    "- Base your answer primarily on the provided context\n"
+    "- If you reference specific information, mention the source\n"
+    "- If the context is insufficient, acknowledge this and provide what help you can\n"
+    "- Be conversational and helpful\n"
+    "\n"
+    "CONTEXT:\n"
+)
+
+# Persistent embedding cache shared by every worker process on this host
+_EMBEDDING_DISK_CACHE: Optional[diskcache.Cache] = None
+_EMBEDDING_DISK_CACHE_FAILED = False
+_EMBEDDING_DISK_CACHE_LOCK = threading.Lock()
+
+def _embedding_disk_cache() -> Optional[diskcache.Cache]:
+    """Open the on-disk embedding cache on first use (None when disabled or unavailable)."""
+    global _EMBEDDING_DISK_CACHE, _EMBEDDING_DISK_CACHE_FAILED
+    if not CFG.EMB_CACHE_DIR:
+        return None
+    
+    with _EMBEDDING_DISK_CACHE_LOCK:
+        if _EMBEDDING_DISK_CACHE is None and not _EMBEDDING_DISK_CACHE_FAILED:
+            try:
+                _EMBEDDING_DISK_CACHE = diskcache.Cache(
+                    CFG.EMB_CACHE_DIR,
+                    size_limit=2 << 30,  # 2 GiB
+                    eviction_policy="least-recently-used",
+                    timeout=0.05  # Seconds to wait on the SQLite lock before giving up
+                )
+            except Exception as e:
+                # Remember the failure so lookups do not retry (and warn) on every query
+                _EMBEDDING_DISK_CACHE_FAILED = True
+                logger.warning("Embedding disk cache unavailable: %s", e)
+        return _EMBEDDING_DISK_CACHE
+
+@dataclass(frozen=True, slots=True)
+class Document:
+    """A retrieved document, kept compact and immutable since cached instances are shared."""
+    
+    content: str
+    score: float = 0.0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    source: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "Document":
+        """Build a Document from the dict form returned by search_documents."""
+        metadata = doc.get('metadata', {})
+        source = metadata.get('source')
+        return cls(doc['content'], doc.get('score', 0.0), metadata, None if source is None else str(source))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict form with content, score and metadata, as returned by search_documents."""
+        return {"content": self.content, "score": self.score, "metadata": dict(self.metadata)}
+
+@lru_cache(maxsize=None)
+def _prompt_builder(count: int) -> Callable[[Sequence[Document], str], str]:
+    """
+    Generate a prompt builder unrolled for exactly ``count`` documents.
+    
+    The generated function joins one flat tuple of constants and attribute
+    reads, with no loop, counter or f-string formatting per document. Its
+    output is byte-identical to RAGService._build_prompt.
+    
+    Args:
+        count: Number of documents the builder accepts
+        
+    Returns:
+        Function taking (documents, user_query) and returning the prompt
+    """
+    # (is_literal, text) pieces; adjacent literals are merged below
+    pieces: List[Tuple[bool, str]] = [(False, "_PROMPT_PREFIX")]
+    for i in range(1, count + 1):
+        if i > 1:
+            pieces.append((True, "\n"))
+        pieces.append((True, f"[Source {i}: "))
+        pieces.append((False, f"(d{i}.source or {f'Document {i}'!r})"))
+        pieces.append((True, "]\n"))
+        pieces.append((False, f"d{i}.content[:MAX_DOCUMENT_CHARS]"))
+        pieces.append((True, "\n"))
+    pieces.append((True, "\n\nUSER QUESTION: "))
+    pieces.append((False, "user_query"))
+    
+    operands = []
+    literal = ""
+    for is_literal, text in pieces:
+        if is_literal:
+            literal += text
+            continue
+        if literal:
+            operands.append(repr(literal))
+            literal = ""
+        operands.append(text)
+    
+    names = ", ".join(f"d{i}" for i in range(1, count + 1))
+    source = (
+        f"def build_prompt(documents, user_query):\n"
+        f"    {names}, = documents\n"
+        f"    return ''.join(({', '.join(operands)},))\n"
+    )
+    namespace = {"_PROMPT_PREFIX": _PROMPT_PREFIX, "MAX_DOCUMENT_CHARS": MAX_DOCUMENT_CHARS}
+    exec(compile(source, f"<prompt builder for {count} documents>", "exec"), namespace)
+    return namespace["build_prompt"]
+
 class RAGService:
     """
     RAG service that retrieves relevant documents from Azure AI Search 
     and uses them to enhance AI responses.
+    
+    Use ``RAGService.get()`` to share one instance (and its caches and
+    connection pools) per process; Azure clients are created on first use.
     """
     
+    _instance: ClassVar[Optional["RAGService"]] = None
+    _instance_lock: ClassVar[threading.Lock] = threading.Lock()
+    
+    # Index fields probed for document content, in order of preference
+    _CONTENT_FIELDS = ("content", "text", "body", "description", "summary")
+    
+    # Index fields copied into document metadata
+    _META_FIELDS = frozenset({"title", "source", "url", "filename", "category", "tags", "date"})
+    
+    @classmethod
+    def get(cls) -> "RAGService":
+        """Return the process-wide RAG service, creating it on first call."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
     def __init__(self):
-        """Initialize the RAG service with Azure AI Search client."""
-        self.config = Config()
+        """Initialize the RAG service caches; Azure clients are created lazily."""
+        self.config = CFG
+        
+        # Exact-match cache of formatted search results, keyed by query hash
+        self._query_cache: TTLCache = TTLCache(maxsize=self.config.RAG_CACHE_SIZE, ttl=self.config.RAG_CACHE_TTL)
+        self._query_cache_lock = threading.RLock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
+        # Embedding-similarity cache so paraphrased queries reuse hybrid search results
+        self._semantic_cache: Optional[SemanticCache] = None
+        if self.config.RAG_SEMANTIC_CACHE_SIZE > 0:
+            self._semantic_cache = SemanticCache(
+                capacity=self.config.RAG_SEMANTIC_CACHE_SIZE,
+                threshold=self.config.RAG_SEMANTIC_CACHE_THRESHOLD,
+                ttl=self.config.RAG_CACHE_TTL
+            )
+        
+        # Query embeddings keyed by model and sha256 of the query text
+        self._embedding_cache: LRUCache = LRUCache(maxsize=4096)
+        self._embedding_cache_lock = threading.Lock()
+        
+        # Model arguments shared by every embeddings request
+        self._embedding_args: Dict[str, Any] = {"model": self.config.AZURE_OPENAI_EMBEDDING_MODEL}
+        if self.config.AZURE_OPENAI_EMBEDDING_DIMENSIONS > 0:
+            self._embedding_args["dimensions"] = self.config.AZURE_OPENAI_EMBEDDING_DIMENSIONS
+        
+        # Specialize prompt assembly for the configured result count up front
+        if self.config.RAG_TOP_K > 0:
+            _prompt_builder(self.config.RAG_TOP_K)
+        
+        # Fields Azure Search returns per document (None returns every retrievable field).
+        # The SDK decodes responses with the stdlib json module and offers no hook
+        # for another parser, so the response size set here is what drives
+        # decoding cost per search.
+        self._select: Optional[List[str]] = [
+            name.strip() for name in self.config.RAG_SELECT_FIELDS.split(",") if name.strip()
+        ] or None
+        
+        # Pooled sessions so concurrent searches reuse warm TLS connections. The
+        # aiohttp session binds to the running event loop, so it is opened with
+        # the async client on first use
+        self._search_session = requests.Session()
+        self._search_session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=64))
+        self._async_search_session: Optional[aiohttp.ClientSession] = None
         
         if not self.config.ENABLE_RAG:
             logger.info("RAG is disabled in configuration")
-            self.search_client = None
-            return
+    
+    @cached_property
+    def search_client(self) -> Optional[SearchClient]:
+        """Azure AI Search client, built on first use (None when RAG is disabled or setup fails)."""
+        if not self.config.ENABLE_RAG:
+            return None
         
         try:
-            # Initialize Azure AI Search client
-            # Following Azure best practices: prefer managed identity in production
-            if self.config.AZURE_SEARCH_KEY:
-                credential = AzureKeyCredential(self.config.AZURE_SEARCH_KEY)
-                logger.info("Using API key authentication for Azure AI Search")
-            else:
-                credential = DefaultAzureCredential()
-                logger.info("Using managed identity authentication for Azure AI Search")
-            
-            self.search_client = SearchClient(
+            client = SearchClient(
                 endpoint=self.config.AZURE_SEARCH_ENDPOINT,
                 index_name=self.config.AZURE_SEARCH_INDEX,
-                credential=credential
+                credential=self._search_credential(),
+                transport=RequestsTransport(session=self._search_session, session_owner=False)
             )
+        except Exception as e:
+            logger.error("Failed to initialize RAG service: %s", e)
+            return None
+        
+        logger.info("RAG service initialized with index: %s", self.config.AZURE_SEARCH_INDEX)
+        return client
+    
+    @cached_property
+    def _async_search_client(self) -> Optional[AsyncSearchClient]:
+        """Async twin of search_client used by retrieve_async to race search strategies."""
+        if not self.config.ENABLE_RAG:
+            return None
+        
+        try:
+            self._async_search_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=64, limit_per_host=64, keepalive_timeout=60)
+            )
+            return AsyncSearchClient(
+                endpoint=self.config.AZURE_SEARCH_ENDPOINT,
+                index_name=self.config.AZURE_SEARCH_INDEX,
+                credential=self._search_credential(is_async=True),
+                transport=AioHttpTransport(session=self._async_search_session, session_owner=False)
+            )
+        except Exception as e:
+            logger.error("Failed to initialize async RAG search client: %s", e)
+            return None
+    
+    def _search_credential(self, is_async: bool = False) -> Any:
+        """
+        Credential for Azure AI Search.
+        
+        Following Azure best practices, managed identity is preferred in
+        production: it is tried first, so hosted deployments skip the probes
+        DefaultAzureCredential runs for environment and developer credentials.
+        The credential lives as long as the client, so its token cache is
+        reused across requests.
+        """
+        if self.config.AZURE_SEARCH_KEY:
+            logger.info("Using API key authentication for Azure AI Search")
+            return AzureKeyCredential(self.config.AZURE_SEARCH_KEY)
+        
+        logger.info("Using managed identity authentication for Azure AI Search")
+        if is_async:
+            return AsyncChainedTokenCredential(AsyncManagedIdentityCredential(), AsyncDefaultAzureCredential())
+        return ChainedTokenCredential(ManagedIdentityCredential(), DefaultAzureCredential())
+    
+    @cached_property
+    def _openai_client(self) -> AzureOpenAI:
+        """Embeddings client for the sync search path, created once so every call reuses its connections."""
+        return AzureOpenAI(
+            api_key=self.config.AZURE_OPENAI_API_KEY,
+            api_version=self.config.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=self.config.AZURE_OPENAI_ENDPOINT,
+            http_client=httpx.Client(
+                timeout=self.config.REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        )
+    
+    @cached_property
+    def _async_openai_client(self) -> AsyncAzureOpenAI:
+        """Embeddings client for the async search path, created once so every call reuses its connections."""
+        return AsyncAzureOpenAI(
+            api_key=self.config.AZURE_OPENAI_API_KEY,
+            api_version=self.config.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=self.config.AZURE_OPENAI_ENDPOINT,
+            http_client=httpx.AsyncClient(
+                timeout=self.config.REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        )
+    
+    def _embedding_key(self, query: str) -> str:
+        """Cache key for a query embedding; embeddings depend only on model, dimensions and text."""
+        return (
+            f"{self.config.AZURE_OPENAI_EMBEDDING_MODEL}:{self.config.AZURE_OPENAI_EMBEDDING_DIMENSIONS}:"
+            f"{hashlib.sha256(query.encode('utf-8')).hexdigest()}"
+        )
+    
+    def _cached_embedding(self, key: str) -> Optional[np.ndarray]:
+        """Look up an embedding in memory, then on disk (promoting disk hits to memory)."""
+        embedding = self._memory_embedding(key)
+        if embedding is not None:
+            return embedding
+        return self._disk_embedding(key)
+    
+    async def _cached_embedding_async(self, key: str) -> Optional[np.ndarray]:
+        """Like _cached_embedding, but reads the disk tier in a worker thread so the event loop never waits on SQLite."""
+        embedding = self._memory_embedding(key)
+        if embedding is not None or not self.config.EMB_CACHE_DIR:
+            return embedding
+        return await asyncio.to_thread(self._disk_embedding, key)
+    
+    def _memory_embedding(self, key: str) -> Optional[np.ndarray]:
+        """Look up an embedding in the in-memory LRU cache."""
+        with self._embedding_cache_lock:
+            return self._embedding_cache.get(key)
+    
+    def _disk_embedding(self, key: str) -> Optional[np.ndarray]:
+        """Look up an embedding on disk, promoting hits to memory (blocking, never raises)."""
+        disk_cache = _embedding_disk_cache()
+        if disk_cache is None:
+            return None
+        
+        try:
+            stored = disk_cache.get(key)
+        except diskcache.Timeout:
+            # A slow or locked disk cache must never hold up the query
+            return None
+        except Exception as e:
+            # Reads are best effort too; a broken cache only costs an API call
+            logger.debug("Embedding disk cache read failed: %s", e)
+            return None
+        if stored is None:
+            return None
+        
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = stored
+        return stored
+    
+    def _store_embedding(self, key: str, embedding: List[float], persist: bool = True) -> np.ndarray:
+        """
+        Cache an embedding in compact form.
+        
+        Args:
+            key: Embedding cache key
+            embedding: Embedding returned by the API
+            persist: Also write it to the disk cache (blocking); async callers
+                pass False and persist it off the event loop
             
-            logger.info(f"RAG service initialized with index: {self.config.AZURE_SEARCH_INDEX}")
-            
+        Returns:
+            The stored float16 embedding
+        """
+        embedding = np.asarray(embedding, dtype=EMBEDDING_DTYPE)
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+        
+        if persist:
+            self._persist_embedding(key, embedding)
+        return embedding
+    
+    def _persist_embedding(self, key: str, embedding: np.ndarray) -> None:
+        """Write an embedding to the disk cache; best effort, never raises."""
+        disk_cache = _embedding_disk_cache()
+        if disk_cache is None:
+            return
+        
+        try:
+            disk_cache.set(key, embedding)
+        except diskcache.Timeout:
+            logger.debug("Embedding disk cache busy - skipped write")
         except Exception as e:
-            logger.error(f"Failed to initialize RAG service: {e}")
-            self.search_client = None
-            raise
+            logger.debug("Embedding disk cache write failed: %s", e)
     
-    def _get_query_embedding(self, query: str) -> List[float]:
+    def _get_query_embedding(self, query: str) -> Optional[np.ndarray]:
         """
         Generate embedding for the query using Azure OpenAI.
         This is required for vector search in hybrid mode.
+        Embeddings are deterministic, so identical queries are served from cache.
+        Returns a float16 vector, or None if the embedding could not be generated.
         """
+        key = self._embedding_key(query)
+        embedding = self._cached_embedding(key)
+        if embedding is not None:
+            return embedding
+        
         try:
-            from openai import AzureOpenAI
-            
-            # Initialize OpenAI client for embeddings
-            openai_client = AzureOpenAI(
-                api_key=self.config.AZURE_OPENAI_API_KEY,
-                api_version="2024-02-01",
-                azure_endpoint=self.config.AZURE_OPENAI_ENDPOINT
-            )
-            
             # Generate embedding using Azure OpenAI text embedding model
-            response = openai_client.embeddings.create(
-                input=query,
-                model="text-embedding-ada-002"  # Standard embedding model
+            response = self._openai_client.embeddings.create(
+                input=[query],
+                **self._embedding_args
             )
+            embedding = response.data[0].embedding
             
-            return response.data[0].embedding
+        except Exception as e:
+            logger.warning("Failed to generate query embedding: %s", e)
+            # Return None to disable vector search
+            return None
+        
+        return self._store_embedding(key, embedding)
+    
+    async def _get_query_embedding_async(self, query: str) -> Optional[np.ndarray]:
+        """Async variant of _get_query_embedding sharing the same caches."""
+        key = self._embedding_key(query)
+        embedding = await self._cached_embedding_async(key)
+        if embedding is not None:
+            return embedding
+        return await self._embed_async(query, key)
+    
+    async def _embed_async(self, query: str, key: str) -> Optional[np.ndarray]:
+        """Request an embedding from Azure OpenAI and cache it, skipping the cache lookup."""
+        try:
+            response = await self._async_openai_client.embeddings.create(
+                input=[query],
+                **self._embedding_args
+            )
+            embedding = response.data[0].embedding
             
         except Exception as e:
-            logger.warning(f"Failed to generate query embedding: {e}")
-            # Return empty list to disable vector search
-            return []
+            logger.warning("Failed to generate query embedding: %s", e)
+            # Return None to disable vector search
+            return None
+        
+        embedding = self._store_embedding(key, embedding, persist=False)
+        # Persist in the background; the search does not need to wait for the disk write
+        asyncio.get_running_loop().run_in_executor(None, self._persist_embedding, key, embedding)
+        return embedding
+    
+    def _get_query_embeddings_batch(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Generate embeddings for several queries, e.g. to warm the cache offline.
+        Cache misses are sent in batches of up to EMBEDDING_BATCH_SIZE inputs per request.
+        
+        Args:
+            queries: Queries to embed
+            
+        Returns:
+            Float16 embeddings in the same order as the queries (None where a request failed)
+        """
+        keys = [self._embedding_key(query) for query in queries]
+        found: Dict[str, np.ndarray] = {}
+        
+        # Embed each distinct missing query once
+        missing: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            if key in found or key in missing:
+                continue
+            embedding = self._cached_embedding(key)
+            if embedding is not None:
+                found[key] = embedding
+            else:
+                missing[key] = query
+        
+        pending = list(missing.items())
+        for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+            batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+            try:
+                response = self._openai_client.embeddings.create(
+                    input=[query for _, query in batch],
+                    **self._embedding_args
+                )
+            except Exception as e:
+                logger.warning("Failed to generate embeddings for %d queries: %s", len(batch), e)
+                continue
+            
+            for item in response.data:
+                key = batch[item.index][0]
+                found[key] = self._store_embedding(key, item.embedding)
+        
+        return [found.get(key) for key in keys]
     
     def search_documents(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
         """
@@ -90,139 +516,442 @@ class RAGService:
         Returns:
             List of relevant documents with their content and metadata
         """
+        return [doc.to_dict() for doc in self.retrieve(query, top_k)]
+    
+    async def search_documents_async(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search for relevant documents without blocking the event loop.
+        
+        Args:
+            query: User's search query
+            top_k: Number of top results to return (defaults to config value)
+            
+        Returns:
+            List of relevant documents with their content and metadata
+        """
+        return [doc.to_dict() for doc in await self.retrieve_async(query, top_k)]
+    
+    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Document]:
+        """
+        Search for relevant documents in Azure AI Search.
+        
+        Args:
+            query: User's search query
+            top_k: Number of top results to return (defaults to config value)
+            
+        Returns:
+            Retrieved documents, best first
+        """
         if not self.search_client:
             logger.warning("RAG service not available - returning empty results")
             return []
         
+        if self.is_trivial_query(query):
+            logger.info("Skipping search for conversational message")
+            return []
+        
         top_k = top_k or self.config.RAG_TOP_K
         
+        cache_key = self._query_cache_key(query, top_k)
+        cached = self._cached_results(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            logger.info(f"Searching for: '{query}' (top {top_k} results)")
+            logger.info("Searching for: %r (top %d results)", query, top_k)
+            
+            query_embedding: Optional[np.ndarray] = None
             
             # Configure search parameters based on search type
             if self.config.RAG_SEARCH_TYPE == "hybrid":
                 # True hybrid search: combines full-text and vector search
+                query_embedding = self._get_query_embedding(query)
+                
+                # A paraphrase of a recently answered query can reuse its documents
+                cached = self._similar_results(query_embedding, top_k, cache_key)
+                if cached is not None:
+                    return cached
+                
                 try:
-                    query_embedding = self._get_query_embedding(query)
-                    if query_embedding:  # Only add vector query if embedding generation succeeded
-                        search_params = {
-                            "search_text": query,  # Full-text search
-                            "vector_queries": [{
-                                "kind": "vector",  # Required parameter
-                                "vector": query_embedding,
-                                "k_nearest_neighbors": top_k,
-                                "fields": "text_vector"  # Adjust field name based on your index
-                            }],
-                            "top": top_k,
-                            "include_total_count": True,
-                            "query_type": "semantic",
-                            "semantic_configuration_name": "rag-search-semantic-configuration"
-                        }
+                    if query_embedding is not None:  # Only add vector query if embedding generation succeeded
+                        search_params = self._hybrid_params(query, query_embedding, top_k)
                     else:
                         # Fallback to semantic search without vector if embedding fails
-                        search_params = {
-                            "search_text": query,
-                            "top": top_k,
-                            "include_total_count": True,
-                            "query_type": "semantic",
-                            "semantic_configuration_name": "rag-search-semantic-configuration"
-                        }
+                        search_params = self._semantic_params(query, top_k)
                     results = self.search_client.search(**search_params)
                     logger.info("Using true hybrid search (full-text + vector + semantic)")
                 except Exception as hybrid_error:
-                    logger.warning(f"Hybrid search failed: {hybrid_error}")
+                    logger.warning("Hybrid search failed: %s", hybrid_error)
                     # Fall back to semantic search only
                     try:
-                        search_params = {
-                            "search_text": query,
-                            "top": top_k,
-                            "include_total_count": True,
-                            "query_type": "semantic",
-                            "semantic_configuration_name": "rag-search-semantic-configuration"
-                        }
-                        results = self.search_client.search(**search_params)
+                        results = self.search_client.search(**self._semantic_params(query, top_k))
                         logger.info("Using semantic search (fallback from hybrid)")
                     except Exception as semantic_error:
-                        logger.warning(f"Semantic search failed: {semantic_error}")
+                        logger.warning("Semantic search failed: %s", semantic_error)
                         # Final fallback to simple search
-                        search_params = {
-                            "search_text": query,
-                            "top": top_k,
-                            "include_total_count": True
-                        }
-                        results = self.search_client.search(**search_params)
+                        results = self.search_client.search(**self._simple_params(query, top_k))
                         logger.info("Using simple search (final fallback)")
             elif self.config.RAG_SEARCH_TYPE == "semantic":
                 # Semantic search only
                 try:
-                    search_params = {
-                        "search_text": query,
-                        "top": top_k,
-                        "include_total_count": True,
-                        "query_type": "semantic",
-                        "semantic_configuration_name": "rag-search-semantic-configuration"
-                    }
-                    results = self.search_client.search(**search_params)
+                    results = self.search_client.search(**self._semantic_params(query, top_k))
                     logger.info("Using semantic search")
                 except Exception as semantic_error:
-                    logger.warning(f"Semantic search failed: {semantic_error}")
+                    logger.warning("Semantic search failed: %s", semantic_error)
                     # Fall back to simple search
-                    search_params = {
-                        "search_text": query,
-                        "top": top_k,
-                        "include_total_count": True
-                    }
-                    results = self.search_client.search(**search_params)
+                    results = self.search_client.search(**self._simple_params(query, top_k))
                     logger.info("Using simple search (fallback from semantic)")
             else:
                 # Use simple search
-                search_params = {
-                    "search_text": query,
-                    "top": top_k,
-                    "include_total_count": True
-                }
-                results = self.search_client.search(**search_params)
+                results = self.search_client.search(**self._simple_params(query, top_k))
+                logger.info("Using simple search")
+            
+            # Process and format results; stop at top_k so the pager never
+            # fetches a page beyond what the prompt will use
+            documents = self._deduplicate(
+                [self._format_result(result) for result in itertools.islice(results, top_k)]
+            )
+            
+            logger.info("Retrieved %d documents", len(documents))
+            
+            self._store_results(cache_key, documents, query_embedding, top_k)
+            return documents
+            
+        except Exception as e:
+            logger.error("Error searching documents: %s", e)
+            return []
+    
+    async def retrieve_async(self, query: str, top_k: Optional[int] = None) -> List[Document]:
+        """
+        Search for relevant documents without blocking the event loop.
+        
+        In hybrid mode a cached query embedding is first checked against the
+        semantic cache. Otherwise the embedding request and a semantic search
+        start together, and the hybrid search follows as soon as the embedding
+        arrives. The hybrid results are used if they arrive within
+        RAG_HYBRID_TIMEOUT, otherwise the semantic results (started only then
+        when the embedding was cached), and simple search only if both fail.
+        
+        Args:
+            query: User's search query
+            top_k: Number of top results to return (defaults to config value)
+            
+        Returns:
+            Retrieved documents, best first
+        """
+        if not self._async_search_client:
+            logger.warning("RAG service not available - returning empty results")
+            return []
+        
+        if self.is_trivial_query(query):
+            logger.info("Skipping search for conversational message")
+            return []
+        
+        top_k = top_k or self.config.RAG_TOP_K
+        
+        cache_key = self._query_cache_key(query, top_k)
+        cached = self._cached_results(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            logger.info("Searching for: %r (top %d results)", query, top_k)
+            
+            query_embedding: Optional[np.ndarray] = None
+            
+            if self.config.RAG_SEARCH_TYPE == "hybrid":
+                # With the embedding already cached, a paraphrase hit is known before
+                # any search is sent, so no semantic query is billed just to be cancelled
+                embedding_key = self._embedding_key(query)
+                query_embedding = await self._cached_embedding_async(embedding_key)
+                cached = self._similar_results(query_embedding, top_k, cache_key)
+                if cached is not None:
+                    return cached
+                
+                # Semantic search only races the embedding request; with a cached
+                # embedding it starts lazily if the hybrid search falls short
+                embedding_task: Optional[asyncio.Task] = None
+                semantic_task: Optional[asyncio.Task] = None
+                if query_embedding is None:
+                    embedding_task = asyncio.create_task(self._embed_async(query, embedding_key))
+                    semantic_task = asyncio.create_task(self._search_async(self._semantic_params(query, top_k)))
+                hybrid_task: Optional[asyncio.Task] = None
+                try:
+                    if embedding_task is not None:
+                        query_embedding = await embedding_task
+                        
+                        # A paraphrase of a recently answered query can reuse its documents
+                        cached = self._similar_results(query_embedding, top_k, cache_key)
+                        if cached is not None:
+                            return cached
+                    
+                    documents = None
+                    if query_embedding is not None:
+                        hybrid_task = asyncio.create_task(
+                            self._search_async(self._hybrid_params(query, query_embedding, top_k))
+                        )
+                        done, _ = await asyncio.wait({hybrid_task}, timeout=self.config.RAG_HYBRID_TIMEOUT)
+                        if hybrid_task in done and hybrid_task.exception() is None:
+                            documents = hybrid_task.result()
+                            logger.info("Using true hybrid search (full-text + vector + semantic)")
+                        elif hybrid_task in done:
+                            logger.warning("Hybrid search failed: %s", hybrid_task.exception())
+                        else:
+                            logger.warning("Hybrid search timed out - using semantic search results")
+                    
+                    if documents is None:
+                        if semantic_task is None:
+                            semantic_task = asyncio.create_task(self._search_async(self._semantic_params(query, top_k)))
+                        try:
+                            documents = await semantic_task
+                            logger.info("Using semantic search (fallback from hybrid)")
+                        except Exception as semantic_error:
+                            logger.warning("Semantic search failed: %s", semantic_error)
+                            documents = await self._search_async(self._simple_params(query, top_k))
+                            logger.info("Using simple search (final fallback)")
+                finally:
+                    # Drop whichever strategy lost the race
+                    for task in (embedding_task, semantic_task, hybrid_task):
+                        if task is None:
+                            continue
+                        if not task.done():
+                            task.cancel()
+                        elif not task.cancelled():
+                            task.exception()  # Mark a losing strategy's error as retrieved
+            elif self.config.RAG_SEARCH_TYPE == "semantic":
+                try:
+                    documents = await self._search_async(self._semantic_params(query, top_k))
+                    logger.info("Using semantic search")
+                except Exception as semantic_error:
+                    logger.warning("Semantic search failed: %s", semantic_error)
+                    documents = await self._search_async(self._simple_params(query, top_k))
+                    logger.info("Using simple search (fallback from semantic)")
+            else:
+                documents = await self._search_async(self._simple_params(query, top_k))
                 logger.info("Using simple search")
             
-            # Process and format results
-            documents = []
-            for result in results:
-                doc = {
-                    "content": self._extract_content(result),
-                    "score": getattr(result, '@search.score', 0),
-                    "metadata": self._extract_metadata(result)
-                }
-                documents.append(doc)
+            documents = self._deduplicate(documents)
+            logger.info("Retrieved %d documents", len(documents))
             
-            logger.info(f"Retrieved {len(documents)} documents")
+            self._store_results(cache_key, documents, query_embedding, top_k)
             return documents
             
         except Exception as e:
-            logger.error(f"Error searching documents: {e}")
+            logger.error("Error searching documents: %s", e)
             return []
     
+    async def _search_async(self, search_params: Dict[str, Any]) -> List[Document]:
+        """Run one search on the async client and format up to its top results."""
+        results = await self._async_search_client.search(**search_params)
+        
+        top_k = search_params["top"]
+        documents = []
+        if top_k <= 0:
+            return documents
+        async for result in results:
+            documents.append(self._format_result(result))
+            if len(documents) >= top_k:
+                break
+        return documents
+    
+    def _hybrid_params(self, query: str, query_embedding: np.ndarray, top_k: int) -> Dict[str, Any]:
+        """Search parameters for full-text + vector search with semantic ranking."""
+        return {
+            "search_text": query,  # Full-text search
+            "vector_queries": [{
+                "kind": "vector",  # Required parameter
+                "vector": query_embedding.astype(np.float32).tolist(),  # Decode from float16 for the request
+                "k_nearest_neighbors": top_k,
+                "fields": self.config.RAG_VECTOR_FIELD,
+                "exhaustive": self.config.RAG_VECTOR_EXHAUSTIVE  # Brute-force KNN instead of HNSW
+            }],
+            "top": top_k,
+            "select": self._select,
+            "query_type": "semantic",
+            "semantic_configuration_name": "rag-search-semantic-configuration"
+        }
+    
+    def _semantic_params(self, query: str, top_k: int) -> Dict[str, Any]:
+        """Search parameters for full-text search with semantic ranking."""
+        return {
+            "search_text": query,
+            "top": top_k,
+            "select": self._select,
+            "query_type": "semantic",
+            "semantic_configuration_name": "rag-search-semantic-configuration"
+        }
+    
+    def _simple_params(self, query: str, top_k: int) -> Dict[str, Any]:
+        """Search parameters for plain full-text search."""
+        return {
+            "search_text": query,
+            "top": top_k,
+            "select": self._select
+        }
+    
+    def _format_result(self, result: Dict[str, Any]) -> Document:
+        """Convert a raw search result into the Document used for caching and prompts."""
+        metadata = self._extract_metadata(result)
+        source = metadata.get('source')
+        return Document(
+            self._extract_content(result),
+            result.get('@search.score', 0.0),
+            metadata,
+            None if source is None else str(source)
+        )
+    
+    def _deduplicate(self, documents: List[Document]) -> List[Document]:
+        """
+        Drop repeated chunks and merge chunks that come from the same source.
+        
+        Chunks whose leading text matches (ignoring case and whitespace) are
+        kept once; chunks sharing a source are concatenated into the first one,
+        up to the per-document prompt limit. Ranking order is preserved.
+        
+        Args:
+            documents: Formatted search results, best first
+            
+        Returns:
+            Deduplicated documents
+        """
+        seen = set()
+        by_source: Dict[str, int] = {}
+        deduped = []
+        for doc in documents:
+            fingerprint = self._content_fingerprint(doc.content)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            
+            if doc.source is None:
+                deduped.append(doc)
+                continue
+            
+            index = by_source.get(doc.source)
+            if index is None:
+                by_source[doc.source] = len(deduped)
+                deduped.append(doc)
+            elif len(deduped[index].content) < MAX_DOCUMENT_CHARS:
+                merged = deduped[index]
+                deduped[index] = replace(merged, content=(merged.content + "\n" + doc.content)[:MAX_DOCUMENT_CHARS])
+        
+        if documents and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Deduplicated %d documents to %d (dedup_ratio=%.2f)",
+                len(documents), len(deduped), 1 - len(deduped) / len(documents)
+            )
+        return deduped
+    
+    @staticmethod
+    def _content_fingerprint(content: str) -> bytes:
+        """Hash the leading text of a document after normalizing case and whitespace."""
+        normalized = " ".join(content[:DEDUP_PREFIX_CHARS].lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    
+    def _cached_results(self, cache_key: Tuple[bytes, int, str]) -> Optional[List[Document]]:
+        """Return a copy of the exact-match cached results, or None on a miss."""
+        with self._query_cache_lock:
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                self._cache_hits += 1
+                logger.debug("Search cache hit (hits=%d, misses=%d)", self._cache_hits, self._cache_misses)
+                return list(cached)
+            self._cache_misses += 1
+        return None
+    
+    def _similar_results(
+        self, query_embedding: Optional[np.ndarray], top_k: int, cache_key: Tuple[bytes, int, str]
+    ) -> Optional[List[Document]]:
+        """Return results cached for a semantically similar query, or None."""
+        if query_embedding is None or self._semantic_cache is None:
+            return None
+        
+        cached = self._semantic_cache.lookup(query_embedding)
+        if cached is None or cached[0] != top_k:
+            return None
+        
+        logger.info("Semantic cache hit - reusing documents from a similar query")
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = cached[1]
+        return list(cached[1])
+    
+    def _store_results(
+        self,
+        cache_key: Tuple[bytes, int, str],
+        documents: List[Document],
+        query_embedding: Optional[np.ndarray],
+        top_k: int
+    ) -> None:
+        """Cache fresh search results in the exact-match and semantic caches."""
+        # Only cache real hits; search errors also come back as an empty list
+        if not documents:
+            return
+        
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = tuple(documents)
+        if query_embedding is not None and self._semantic_cache is not None:
+            self._semantic_cache.insert(query_embedding, (top_k, tuple(documents)), tag=cache_key[0])
+    
+    def is_trivial_query(self, query: str) -> bool:
+        """Whether a query is too short or pure chit-chat ("hi", "thanks", "ok") to search for."""
+        stripped = query.strip()
+        if len(stripped) < self.config.RAG_MIN_QUERY_LEN:
+            return True
+        
+        tokens = {token.strip("!?.,") for token in stripped.lower().split()}
+        return tokens <= _CHITCHAT
+    
+    @staticmethod
+    def _query_hash(query: str) -> bytes:
+        """Hash a query after normalizing case and whitespace."""
+        normalized = " ".join(query.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+    
+    def _query_cache_key(self, query: str, top_k: int) -> Tuple[bytes, int, str]:
+        """Build the search-result cache key for a query."""
+        return (self._query_hash(query), top_k, self.config.RAG_SEARCH_TYPE)
+    
+    def invalidate(self, query: Optional[str] = None) -> None:
+        """
+        Drop cached search results.
+        
+        Args:
+            query: Only drop results for this query; drops everything when omitted
+        """
+        with self._query_cache_lock:
+            if query is None:
+                self._query_cache.clear()
+            else:
+                query_hash = self._query_hash(query)
+                for key in [key for key in self._query_cache if key[0] == query_hash]:
+                    del self._query_cache[key]
+        
+        if self._semantic_cache is not None:
+            self._semantic_cache.invalidate(None if query is None else self._query_hash(query))
+    
     def _extract_content(self, search_result: Dict[str, Any]) -> str:
         """
         Extract main content from search result.
         Customize this based on your index schema.
         """
         # First check for common content fields
-        content_fields = ['content', 'text', 'body', 'description', 'summary']
-        
-        for field in content_fields:
-            if field in search_result and search_result[field]:
-                return str(search_result[field])
+        for name in self._CONTENT_FIELDS:
+            value = search_result.get(name)
+            if value:
+                return str(value)
         
         # Check for your specific index fields (product catalog)
-        if 'chunk' in search_result and search_result['chunk']:
+        chunk = search_result.get('chunk')
+        if chunk:
             content_parts = []
             
             # Add title if available
-            if 'title' in search_result and search_result['title']:
-                content_parts.append(f"Title: {search_result['title']}")
+            title = search_result.get('title')
+            if title:
+                content_parts.append(f"Title: {title}")
             
             # Add main chunk content
-            content_parts.append(str(search_result['chunk']))
+            content_parts.append(str(chunk))
             
             return " | ".join(content_parts)
         
@@ -239,26 +968,26 @@ class RAGService:
         Extract metadata from search result.
         Customize this based on your index schema.
         """
-        # Common metadata fields
-        metadata_fields = ['title', 'source', 'url', 'filename', 'category', 'tags', 'date']
-        
-        metadata = {}
-        for field in metadata_fields:
-            if field in search_result and search_result[field]:
-                metadata[field] = search_result[field]
+        # Common metadata fields, probed once per field present in the result
+        metadata = {
+            name: search_result[name]
+            for name in self._META_FIELDS & search_result.keys()
+            if search_result[name]
+        }
         
         # Add search-specific metadata
-        if '@search.score' in search_result:
-            metadata['search_score'] = search_result['@search.score']
+        score = search_result.get('@search.score')
+        if score is not None:
+            metadata['search_score'] = score
         
         return metadata
     
-    def create_context_prompt(self, documents: List[Dict[str, Any]], user_query: str) -> str:
+    def create_context_prompt(self, documents: Sequence[Union[Document, Dict[str, Any]]], user_query: str) -> str:
         """
         Create a context-enriched prompt for the LLM using retrieved documents.
         
         Args:
-            documents: List of retrieved documents
+            documents: Retrieved documents, as Documents or the dicts returned by search_documents
             user_query: Original user query
             
         Returns:
@@ -267,31 +996,56 @@ class RAGService:
         if not documents:
             return f"User query: {user_query}"
         
-        # Build context from retrieved documents
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            content = doc['content'][:2000]  # Increased limit to capture more content
-            source = doc.get('metadata', {}).get('source', f'Document {i}')
-            context_parts.append(f"[Source {i}: {source}]\n{content}\n")
+        # Invariant prefix first so it can be served from the provider's prompt cache.
+        # Documents follow in a stable order, so the same retrieved set always
+        # yields the same bytes and extends the cached prefix across queries.
+        docs = [doc if isinstance(doc, Document) else Document.from_dict(doc) for doc in documents]
+        docs.sort(key=self._document_sort_key)
         
-        context = "\n".join(context_parts)
+        # Builders unrolled per document count cover every result size up to
+        # RAG_TOP_K; larger explicit top_k values use the generic loop
+        if len(docs) <= self.config.RAG_TOP_K:
+            return _prompt_builder(len(docs))(docs, user_query)
+        return self._build_prompt(docs, user_query)
+    
+    @staticmethod
+    def _build_prompt(docs: Sequence[Document], user_query: str) -> str:
+        """Assemble the prompt from sorted documents with a generic loop."""
+        parts = [_PROMPT_PREFIX]
+        for i, doc in enumerate(docs, 1):
+            if i > 1:
+                parts.append("\n")
+            parts.append(f"[Source {i}: {doc.source or f'Document {i}'}]\n")
+            parts.append(doc.content[:MAX_DOCUMENT_CHARS])
+            parts.append("\n")
+        parts.append("\n\nUSER QUESTION: ")
+        parts.append(user_query)
         
-        # Create enhanced prompt
-        enhanced_prompt = f"""You are a helpful AI assistant. Use the following context information to answer the user's question. If the context doesn't contain relevant information, say so and provide a general response.
-
-CONTEXT:
-{context}
-
-USER QUESTION: {user_query}
-
-Instructions:
-- Base your answer primarily on the provided context
-- If you reference specific information, mention the source
-- If the context is insufficient, acknowledge this and provide what help you can
-- Be conversational and helpful"""
-
-        return enhanced_prompt
+        return "".join(parts)
     
-    def is_available(self) -> bool:
-        """Check if RAG service is available and properly configured."""
-        return self.search_client is not None and self.config.ENABLE_RAG
\ No newline at end of file
+    @staticmethod
+    def _document_sort_key(doc: Document) -> Tuple[str, str]:
+        """Order documents by source, then content, independent of search ranking."""
+        return (doc.source or '', doc.content)
+    
+    @cached_property
+    def configured(self) -> bool:
+        """Whether RAG is enabled and configured (checked once, without connecting)."""
+        return self.config.ENABLE_RAG and bool(self.config.AZURE_SEARCH_ENDPOINT and self.config.AZURE_SEARCH_INDEX)
+    
+    @property
+    def available(self) -> bool:
+        """
+        Whether RAG is configured and no search client has failed to build.
+        
+        Never forces a connection: before the first search this reflects the
+        configuration only, afterwards it also reflects the client build.
+        """
+        if not self.configured:
+            return False
+        
+        # cached_property stores each built (or failed, None) client in the instance dict
+        return not any(
+            name in self.__dict__ and self.__dict__[name] is None
+            for name in ("search_client", "_async_search_client")
+        )
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Semantic cache for RAG search results.
+Reuses retrieved documents for paraphrased queries by comparing query embeddings.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set
+import numpy as np
+
+class SemanticCache:
+    """
+    Fixed-capacity cache mapping query embeddings to search results.
+    
+    Embeddings are stored L2-normalized as float16 in a preallocated matrix so a
+    lookup is a single matrix-vector product over half the bytes of float32.
+    Random-projection LSH buckets narrow that product to the few slots whose
+    sign pattern is within one bit of the query. Once the cache is full,
+    expired slots are reclaimed first and then the least recently used one.
+    """
+    
+    def __init__(self, capacity: int, threshold: float, ttl: float, num_bits: int = 8, seed: int = 0):
+        """
+        Initialize an empty semantic cache.
+        
+        Args:
+            capacity: Maximum number of cached queries
+            threshold: Minimum cosine similarity for a cache hit
+            ttl: Seconds before a cached entry expires
+            num_bits: Number of random hyperplanes used for LSH bucketing
+            seed: Seed for the random projection, fixed so buckets are stable
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.num_bits = num_bits
+        self._seed = seed
+        self._lock = threading.Lock()
+        
+        # Allocated on first insert, once the embedding dimension is known
+        self._keys: Optional[np.ndarray] = None
+        self._projection: Optional[np.ndarray] = None
+        self._bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+        
+        self._values: List[Optional[Any]] = [None] * capacity
+        self._slot_bucket: List[Optional[int]] = [None] * capacity
+        self._slot_tag: List[Optional[Any]] = [None] * capacity
+        self._slot_expiry = np.zeros(capacity, dtype=np.float64)
+        self._buckets: Dict[int, Set[int]] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+    
+    def lookup(self, embedding: Sequence[float]) -> Optional[Any]:
+        """
+        Return the cached value for the most similar stored embedding.
+        
+        Args:
+            embedding: Query embedding
+        
+        Returns:
+            Cached value if a live entry meets the similarity threshold, else None
+        """
+        with self._lock:
+            if self._keys is None or not self._lru:
+                return None
+            
+            query = self._normalize(embedding)
+            if query is None or query.shape[0] != self._keys.shape[1]:
+                return None
+            
+            candidates = self._candidate_slots(self._bucket(query))
+            if not candidates:
+                return None
+            
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            alive = self._slot_expiry[slots] > time.monotonic()
+            for slot in slots[~alive].tolist():
+                # Free expired entries so they stop being rescanned
+                self._release(slot)
+            live = slots[alive]
+            if live.size == 0:
+                return None
+            
+            # float16 keys are upcast against the float32 query
+            sims = self._keys[live] @ query
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            
+            slot = int(live[best])
+            self._lru.move_to_end(slot)
+            return self._values[slot]
+    
+    def insert(self, embedding: Sequence[float], value: Any, tag: Any = None) -> None:
+        """
+        Store a value under a query embedding.
+        
+        An existing entry at or above the similarity threshold is overwritten;
+        otherwise a free slot is used, then an expired one, and only then the
+        least recently used entry is evicted.
+        
+        Args:
+            embedding: Query embedding
+            value: Value to return for similar queries
+            tag: Optional label (e.g. a query hash) used for targeted invalidation
+        """
+        with self._lock:
+            query = self._normalize(embedding)
+            if query is None or self.capacity <= 0:
+                return
+            
+            if self._keys is not None and query.shape[0] != self._keys.shape[1]:
+                # Embedding model changed; the stored vectors are no longer comparable
+                self._clear_locked()
+            
+            if self._keys is None:
+                dim = query.shape[0]
+                self._keys = np.zeros((self.capacity, dim), dtype=np.float16)
+                self._projection = np.random.default_rng(self._seed).standard_normal((dim, self.num_bits)).astype(np.float32)
+            
+            bucket = self._bucket(query)
+            slot = self._matching_slot(query, bucket)
+            if slot is not None:
+                # Replace a near-identical entry instead of shadowing it
+                del self._lru[slot]
+                self._unlink(slot)
+            else:
+                if not self._free:
+                    self._reclaim_expired()
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot, _ = self._lru.popitem(last=False)
+                    self._unlink(slot)
+            
+            self._keys[slot] = query
+            self._values[slot] = value
+            self._slot_bucket[slot] = bucket
+            self._slot_tag[slot] = tag
+            self._slot_expiry[slot] = time.monotonic() + self.ttl
+            self._buckets.setdefault(bucket, set()).add(slot)
+            self._lru[slot] = None
+    
+    def invalidate(self, tag: Any = None) -> None:
+        """
+        Drop cached entries.
+        
+        Args:
+            tag: Only drop entries stored with this tag; drops everything when omitted
+        """
+        with self._lock:
+            if tag is None:
+                self._clear_locked()
+                return
+            
+            for slot in [slot for slot in self._lru if self._slot_tag[slot] == tag]:
+                self._release(slot)
+    
+    def _normalize(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """L2-normalize an embedding as float32, or None if it is empty or zero."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) if vector.size else 0.0
+        if norm == 0.0:
+            return None
+        return vector / norm
+    
+    def _bucket(self, vector: np.ndarray) -> int:
+        """Pack the signs of the random projections into an integer bucket id."""
+        bits = (vector @ self._projection) > 0
+        return int(bits @ self._bit_weights)
+    
+    def _candidate_slots(self, bucket: int) -> List[int]:
+        """Collect slots in the query's bucket and the buckets one bit away."""
+        candidates = list(self._buckets.get(bucket, ()))
+        for bit in range(self.num_bits):
+            candidates.extend(self._buckets.get(bucket ^ (1 << bit), ()))
+        return candidates
+    
+    def _matching_slot(self, query: np.ndarray, bucket: int) -> Optional[int]:
+        """Return the stored slot most similar to the query if it meets the threshold."""
+        candidates = self._candidate_slots(bucket)
+        if not candidates:
+            return None
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        sims = self._keys[slots] @ query
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return int(slots[best])
+    
+    def _reclaim_expired(self) -> None:
+        """Free every expired slot; the caller must hold the lock."""
+        now = time.monotonic()
+        for slot in [slot for slot in self._lru if self._slot_expiry[slot] <= now]:
+            self._release(slot)
+    
+    def _release(self, slot: int) -> None:
+        """Drop a stored slot and return it to the free list."""
+        del self._lru[slot]
+        self._unlink(slot)
+        self._free.append(slot)
+    
+    def _unlink(self, slot: int) -> None:
+        """Remove a slot from its bucket and release its value."""
+        bucket = self._slot_bucket[slot]
+        members = self._buckets.get(bucket)
+        if members is not None:
+            members.discard(slot)
+            if not members:
+                del self._buckets[bucket]
+        self._values[slot] = None
+        self._slot_bucket[slot] = None
+        self._slot_tag[slot] = None
+        self._slot_expiry[slot] = 0.0
+    
+    def _clear_locked(self) -> None:
+        """Reset the cache; the caller must hold the lock."""
+        self._keys = None
+        self._projection = None
+        self._values = [None] * self.capacity
+        self._slot_bucket = [None] * self.capacity
+        self._slot_tag = [None] * self.capacity
+        self._slot_expiry[:] = 0.0
+        self._buckets.clear()
+        self._lru.clear()
+        self._free = list(range(self.capacity - 1, -1, -1))